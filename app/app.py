@@ -2,12 +2,13 @@
 
 import os
 import re
+import shutil
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 import streamlit as st
 
-from clipper import build_clips_for_local_file, build_clips_for_video
+from clipper import build_clips_for_local_file, build_clips_for_video, download_videos_batch
 from config import (
     DEFAULT_CATEGORY,
     DEFAULT_REGION,
@@ -47,6 +48,23 @@ def format_video_row(video: TrendingVideo) -> str:
     )
 
 
+def _video_options(trending: List[TrendingVideo]) -> Dict[str, TrendingVideo]:
+    # The trending list only changes on "Load Trending", so keep its labels across reruns.
+    cache_key = tuple((video.video_id, video.views) for video in trending)
+    cached = st.session_state.get("trending_options")
+    if cached is None or cached[0] != cache_key:
+        cached = (cache_key, {format_video_row(v): v for v in trending})
+        st.session_state["trending_options"] = cached
+    return cached[1]
+
+
+@st.cache_resource(ttl=600, show_spinner=False)
+def _read_clip_bytes(clip_path_str: str, mtime: float) -> bytes:
+    # Reruns share one cached bytes object per clip instead of re-reading it from disk.
+    # cache_resource hands back the same object rather than an unpickled copy per hit.
+    return Path(clip_path_str).read_bytes()
+
+
 def render_download_section() -> None:
     st.divider()
     st.markdown("### Download Hasil")
@@ -60,14 +78,13 @@ def render_download_section() -> None:
         clip_path = Path(clip_path_str)
         if not clip_path.exists():
             continue
-        with clip_path.open("rb") as file_handle:
-            st.download_button(
-                label=f"Download {clip_path.name}",
-                data=file_handle.read(),
-                file_name=clip_path.name,
-                mime="video/mp4",
-                key=f"dl_{clip_path.name}",
-            )
+        st.download_button(
+            label=f"Download {clip_path.name}",
+            data=_read_clip_bytes(str(clip_path), clip_path.stat().st_mtime),
+            file_name=clip_path.name,
+            mime="video/mp4",
+            key=f"dl_{clip_path.name}",
+        )
 
 
 def render_trending_mode(
@@ -107,7 +124,7 @@ def render_trending_mode(
 
     trending: List[TrendingVideo] = st.session_state.trending_cache
     if trending:
-        options = {format_video_row(v): v for v in trending}
+        options = _video_options(trending)
         selected_rows = st.multiselect(
             "2) Pilih video untuk dipotong",
             list(options.keys()),
@@ -123,16 +140,25 @@ def render_trending_mode(
                 total = 0
                 failed = 0
                 collected: List[str] = []
+                video_urls = {
+                    video.video_id: f"https://www.youtube.com/watch?v={video.video_id}"
+                    for video in selected_videos
+                }
+                try:
+                    downloaded = download_videos_batch(list(video_urls.values()), DOWNLOAD_DIR)
+                except Exception:
+                    # Per-video download fallbacks still run inside build_clips_for_video.
+                    downloaded = {}
                 for video in selected_videos:
                     try:
-                        video_url = f"https://www.youtube.com/watch?v={video.video_id}"
                         clips = build_clips_for_video(
                             video_id=video.video_id,
-                            video_url=video_url,
-                            download_dir=Path(DOWNLOAD_DIR),
-                            output_dir=Path(OUTPUT_DIR),
+                            video_url=video_urls[video.video_id],
+                            download_dir=DOWNLOAD_DIR,
+                            output_dir=OUTPUT_DIR,
                             clip_duration=clip_duration,
                             max_clips=clips_per_video,
+                            source_video=downloaded.get(video.video_id),
                         )
                         total += len(clips)
                         collected.extend([str(clip) for clip in clips])
@@ -156,15 +182,18 @@ def render_upload_mode(clip_duration: int, clips_per_video: int) -> None:
             st.warning("Upload 1 file video dulu.")
             return
 
-        source_path = Path(DOWNLOAD_DIR) / f"upload_{upload.name}"
-        source_path.write_bytes(upload.getbuffer())
+        source_path = DOWNLOAD_DIR / f"upload_{upload.name}"
+        # Stream in 1 MB chunks so large uploads don't get materialized in memory first.
+        upload.seek(0)
+        with source_path.open("wb") as out_file:
+            shutil.copyfileobj(upload, out_file, length=1 << 20)
 
         with st.spinner("Memproses upload jadi short clips..."):
             try:
                 clips = build_clips_for_local_file(
                     source_video=source_path,
                     source_id=upload.name,
-                    output_dir=Path(OUTPUT_DIR),
+                    output_dir=OUTPUT_DIR,
                     clip_duration=clip_duration,
                     max_clips=clips_per_video,
                 )
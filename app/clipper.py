@@ -1,14 +1,27 @@
 from __future__ import annotations
 
-import glob
+import functools
+import heapq
+import mmap
 import os
 import re
 import shutil
+import struct
 import subprocess
 import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Tuple
+from typing import Deque, Dict, List, Tuple
+
+try:
+    import streamlit as st
+except ImportError:  # Clipper stays usable outside the Streamlit UI.
+    st = None
 
 
 HOOK_KEYWORDS = [
@@ -24,6 +37,20 @@ HOOK_KEYWORDS = [
     "breaking",
     "terungkap",
 ]
+# One alternation scan per subtitle row instead of a substring search per keyword. The
+# zero-width lookahead lets matches overlap ("wajibreaking" finds both keywords), the
+# same as testing each keyword as a substring.
+HOOK_RE = re.compile("(?=(" + "|".join(map(re.escape, HOOK_KEYWORDS)) + "))", re.IGNORECASE)
+
+
+# A cue is its timing line (optionally followed by cue settings) plus the non-blank
+# text lines under it; a following timing line always starts a new cue. Bytes patterns
+# so VTT files can be scanned straight from an mmap; lines may end in \r\n.
+_CUE_RE = re.compile(
+    rb"(\d{2}):(\d{2}):(\d{2})\.(\d{3})\s-->\s(\d{2}):(\d{2}):(\d{2})\.(\d{3})[^\n]*\n?"
+    rb"((?:(?![^\n]*-->)[^\r\n][^\n]*(?:\n|\Z))*)"
+)
+_TAG_RE = re.compile(rb"<[^>]+>")
 
 
 @dataclass
@@ -33,17 +60,92 @@ class ClipSegment:
     score: int
 
 
-def run_command(args: List[str]) -> str:
+def _cache_data(ttl: int):
+    if st is None:
+        return functools.lru_cache(maxsize=128)
+    return st.cache_data(ttl=ttl, show_spinner=False)
+
+
+def run_command(args: List[str], check: bool = True) -> str:
     env = os.environ.copy()
     # Prevent yt-dlp from reading implicit user-level config in hosted environments.
     env.setdefault("YTDLP_NO_CONFIG", "1")
-    process = subprocess.run(args, capture_output=True, text=True, env=env)
-    if process.returncode != 0:
-        raise RuntimeError(process.stderr.strip() or "Command failed")
-    return process.stdout.strip()
+    # Decode leniently: a stray byte in the child's output (e.g. a non-ASCII file name in
+    # an ffmpeg error under cp1252) must not kill the stderr drain and stall the child.
+    with subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        env=env,
+    ) as process:
+        # Drain stderr concurrently so a chatty child never stalls on a full pipe, and keep
+        # only the tail since that is where ffmpeg/yt-dlp explain a failure.
+        stderr_tail: Deque[str] = deque(maxlen=200)
+        drain = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+        drain.start()
+        stdout = process.stdout.read()
+        process.wait()
+        drain.join()
+    if check and process.returncode != 0:
+        raise RuntimeError("".join(stderr_tail).strip() or "Command failed")
+    return stdout.strip()
+
+
+def _find_mp4_box(handle, start: int, end: int, box_type: bytes) -> Tuple[int, int] | None:
+    offset = start
+    while offset + 8 <= end:
+        handle.seek(offset)
+        box_size, kind = struct.unpack(">I4s", handle.read(8))
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", handle.read(8))[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = end - offset
+        if box_size < header_size:
+            return None
+        if kind == box_type:
+            return offset + header_size, offset + box_size
+        offset += box_size
+    return None
 
 
-def ffprobe_duration(video_path: Path) -> float:
+def _mp4_duration(video_path: Path, file_size: int) -> float | None:
+    # Read duration/timescale from moov/mvhd instead of spawning ffprobe. Returns None for
+    # anything that isn't a plain MP4/MOV (webm, mkv, fragmented files without a duration).
+    try:
+        with video_path.open("rb") as handle:
+            moov = _find_mp4_box(handle, 0, file_size, b"moov")
+            if moov is None:
+                return None
+            mvhd = _find_mp4_box(handle, moov[0], moov[1], b"mvhd")
+            if mvhd is None:
+                return None
+            handle.seek(mvhd[0])
+            version = handle.read(1)[0]
+            if version == 1:
+                handle.seek(mvhd[0] + 20)
+                timescale, duration = struct.unpack(">IQ", handle.read(12))
+                unknown = 0xFFFFFFFFFFFFFFFF
+            else:
+                handle.seek(mvhd[0] + 12)
+                timescale, duration = struct.unpack(">II", handle.read(8))
+                unknown = 0xFFFFFFFF
+    except (OSError, struct.error, IndexError):
+        return None
+    if timescale <= 0 or duration <= 0 or duration == unknown:
+        return None
+    return duration / timescale
+
+
+@_cache_data(ttl=24 * 60 * 60)
+def _ffprobe_duration_cached(video_path_str: str, mtime: float, size: int) -> float:
+    duration = _mp4_duration(Path(video_path_str), size)
+    if duration is not None:
+        return duration
     output = run_command(
         [
             "ffprobe",
@@ -53,13 +155,21 @@ def ffprobe_duration(video_path: Path) -> float:
             "format=duration",
             "-of",
             "default=noprint_wrappers=1:nokey=1",
-            str(video_path),
+            video_path_str,
         ]
     )
     return float(output or 0.0)
 
 
-def _existing_cookie_browser_attempts() -> List[List[str]]:
+def ffprobe_duration(video_path: Path) -> float:
+    # Keyed by mtime/size so Streamlit reruns skip the ffprobe spawn for unchanged files.
+    stat = video_path.stat()
+    return _ffprobe_duration_cached(str(video_path), stat.st_mtime, stat.st_size)
+
+
+# Browser profiles and JS runtimes don't change while the app runs, so probe them once.
+@functools.lru_cache(maxsize=None)
+def _existing_cookie_browser_attempts() -> Tuple[Tuple[str, ...], ...]:
     candidates: List[Tuple[str, List[Path]]] = []
     home = Path.home()
 
@@ -88,11 +198,11 @@ def _existing_cookie_browser_attempts() -> List[List[str]]:
             ]
         )
 
-    attempts: List[List[str]] = []
+    attempts: List[Tuple[str, ...]] = []
     for browser, paths in candidates:
         if any(path.exists() for path in paths):
-            attempts.append(["--cookies-from-browser", browser])
-    return attempts
+            attempts.append(("--cookies-from-browser", browser))
+    return tuple(attempts)
 
 
 def _should_use_browser_cookies() -> bool:
@@ -106,25 +216,23 @@ def _is_cookie_db_error(message: str) -> bool:
     return "cookies database" in lowered and "could not find" in lowered
 
 
-def _available_js_runtimes() -> List[str]:
+@functools.lru_cache(maxsize=None)
+def _available_js_runtimes() -> Tuple[str, ...]:
     runtimes: List[Tuple[str, str]] = [
         ("deno", "deno"),
         ("node", "node"),
         ("bun", "bun"),
         ("quickjs", "qjs"),
     ]
-    return [runtime for runtime, executable in runtimes if shutil.which(executable)]
+    return tuple(runtime for runtime, executable in runtimes if shutil.which(executable))
 
 
-def download_video(video_url: str, download_dir: Path) -> Path:
-    template = str(download_dir / "%(id)s.%(ext)s")
+def _ytdlp_base_args(js_runtimes: Tuple[str, ...]) -> List[str]:
     ytdlp_cmd = [sys.executable, "-m", "yt_dlp"]
     js_runtime_args: List[str] = []
-    js_runtimes = _available_js_runtimes()
-    if js_runtimes:
-        for runtime in js_runtimes:
-            js_runtime_args.extend(["--js-runtimes", runtime])
-    base_args = [
+    for runtime in js_runtimes:
+        js_runtime_args.extend(["--js-runtimes", runtime])
+    return [
         *ytdlp_cmd,
         "--ignore-config",
         *js_runtime_args,
@@ -135,6 +243,47 @@ def download_video(video_url: str, download_dir: Path) -> Path:
         "5",
     ]
 
+
+def download_videos_batch(video_urls: List[str], download_dir: Path) -> Dict[str, Path]:
+    # One yt-dlp process for all URLs saves per-video startup and reuses connections.
+    # Failed videos are just missing from the result; callers retry them via download_video.
+    if not video_urls:
+        return {}
+    template = str(download_dir / "%(id)s.%(ext)s")
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".txt", prefix="batch_", dir=download_dir, delete=False, encoding="utf-8"
+    ) as batch_file:
+        batch_file.write("\n".join(video_urls))
+    try:
+        output = run_command(
+            [
+                *_ytdlp_base_args(_available_js_runtimes()),
+                "--ignore-errors",
+                "-o",
+                template,
+                "--print",
+                "after_move:%(id)s %(filepath)s",
+                "-a",
+                batch_file.name,
+            ],
+            check=False,
+        )
+    finally:
+        os.unlink(batch_file.name)
+
+    downloaded: Dict[str, Path] = {}
+    for line in output.splitlines():
+        video_id, _, filepath = line.strip().partition(" ")
+        if video_id and filepath:
+            downloaded[video_id] = Path(filepath)
+    return downloaded
+
+
+def download_video(video_url: str, download_dir: Path) -> Path:
+    template = str(download_dir / "%(id)s.%(ext)s")
+    js_runtimes = _available_js_runtimes()
+    base_args = _ytdlp_base_args(js_runtimes)
+
     attempts = [
         # Let yt-dlp auto select available formats first.
         [],
@@ -168,7 +317,7 @@ def download_video(video_url: str, download_dir: Path) -> Path:
         attempts.insert(1, ["--extractor-args", "youtube:player_skip=js"])
     # Local fallback using browser cookies only when it is explicitly viable.
     if _should_use_browser_cookies():
-        attempts.extend(_existing_cookie_browser_attempts())
+        attempts.extend(list(attempt) for attempt in _existing_cookie_browser_attempts())
 
     last_error = "Unknown yt-dlp error"
     primary_error = ""
@@ -223,15 +372,23 @@ def download_subtitles(video_url: str, download_dir: Path) -> None:
 
 
 def find_subtitle_file(video_id: str, download_dir: Path) -> Path | None:
-    patterns = [
-        str(download_dir / f"{video_id}*.id*.vtt"),
-        str(download_dir / f"{video_id}*.en*.vtt"),
-        str(download_dir / f"{video_id}*.vtt"),
-    ]
-    for pattern in patterns:
-        matches = glob.glob(pattern)
-        if matches:
-            return Path(matches[0])
+    # Single directory pass; preference order is Indonesian, then English, then any language.
+    best: Dict[str, str] = {}
+    with os.scandir(download_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not (name.startswith(video_id) and name.endswith(".vtt")):
+                continue
+            if ".id" in name:
+                best["id"] = entry.path
+                break
+            if ".en" in name:
+                best.setdefault("en", entry.path)
+            else:
+                best.setdefault("other", entry.path)
+    for language in ("id", "en", "other"):
+        if language in best:
+            return Path(best[language])
     return None
 
 
@@ -246,42 +403,48 @@ def timestamp_to_seconds(ts: str) -> float:
     return int(h) * 3600 + int(m) * 60 + float(s)
 
 
-def parse_vtt(vtt_path: Path) -> List[Tuple[float, float, str]]:
+@_cache_data(ttl=24 * 60 * 60)
+def _parse_vtt_cached(vtt_path_str: str, mtime: float, size: int) -> List[Tuple[float, float, str]]:
     rows: List[Tuple[float, float, str]] = []
-    content = vtt_path.read_text(encoding="utf-8", errors="ignore")
-    blocks = content.split("\n\n")
-    time_re = re.compile(r"(\d{2}:\d{2}:\d{2}\.\d{3})\s-->\s(\d{2}:\d{2}:\d{2}\.\d{3})")
-
-    for block in blocks:
-        lines = [line.strip() for line in block.splitlines() if line.strip()]
-        if not lines:
-            continue
-        match = None
-        text_lines: List[str] = []
-        for line in lines:
-            m = time_re.search(line)
-            if m:
-                match = m
+    if size == 0:
+        return rows
+    # Scan the mapped bytes directly and decode only the cue text that survives tag
+    # stripping; timestamps are ASCII digits that int() reads straight from bytes.
+    with open(vtt_path_str, "rb") as handle, mmap.mmap(
+        handle.fileno(), 0, access=mmap.ACCESS_READ
+    ) as content:
+        for match in _CUE_RE.finditer(content):
+            sh, sm, ss, sms, eh, em, es, ems, body = match.groups()
+            text = " ".join(_TAG_RE.sub(b"", body).decode("utf-8", "ignore").split())
+            if not text:
                 continue
-            if "-->" not in line and "WEBVTT" not in line:
-                text_lines.append(re.sub(r"<[^>]+>", "", line))
-        if not match:
-            continue
-        text = " ".join(text_lines).strip()
-        if not text:
-            continue
-        start = timestamp_to_seconds(match.group(1))
-        end = timestamp_to_seconds(match.group(2))
-        rows.append((start, end, text))
+            start = int(sh) * 3600 + int(sm) * 60 + int(ss) + int(sms) / 1000
+            end = int(eh) * 3600 + int(em) * 60 + int(es) + int(ems) / 1000
+            rows.append((start, end, text))
     return rows
 
 
-def deduplicate_segments(segments: List[ClipSegment], min_gap: float = 2.0) -> List[ClipSegment]:
-    segments = sorted(segments, key=lambda s: (s.start, -s.score))
+def parse_vtt(vtt_path: Path) -> List[Tuple[float, float, str]]:
+    stat = vtt_path.stat()
+    return _parse_vtt_cached(str(vtt_path), stat.st_mtime, stat.st_size)
+
+
+def deduplicate_segments(
+    segments: List[ClipSegment],
+    min_gap: float = 2.0,
+    already_sorted_by_start: bool = False,
+) -> List[ClipSegment]:
+    # Single sweep in start order: overlapping candidates compete for one slot and the
+    # higher score wins (the earlier one on ties).
+    if not already_sorted_by_start:
+        segments = sorted(segments, key=attrgetter("start"))
     filtered: List[ClipSegment] = []
     for seg in segments:
-        if not filtered or seg.start >= filtered[-1].end + min_gap:
-            filtered.append(seg)
+        if filtered and seg.start < filtered[-1].end + min_gap:
+            if seg.score > filtered[-1].score:
+                filtered[-1] = seg
+            continue
+        filtered.append(seg)
     return filtered
 
 
@@ -293,19 +456,19 @@ def pick_segments_from_subtitles(
 ) -> List[ClipSegment]:
     candidates: List[ClipSegment] = []
     for start, end, text in subtitle_rows:
-        lowered = text.lower()
-        score = sum(1 for keyword in HOOK_KEYWORDS if keyword in lowered)
+        score = len({match.lower() for match in HOOK_RE.findall(text)})
         if score <= 0:
             continue
         clip_start = max(0.0, start - 1.2)
         clip_end = min(video_duration, clip_start + clip_duration)
         candidates.append(ClipSegment(start=clip_start, end=clip_end, score=score))
 
-    candidates.sort(key=lambda x: (-x.score, x.start))
-    unique = deduplicate_segments(candidates)
-    if unique:
-        return unique[:max_clips]
-    return []
+    # Cues arrive in file order, so this in-place sort is a near-linear check rather than
+    # a copy plus a full sort inside deduplicate_segments.
+    candidates.sort(key=attrgetter("start"))
+    unique = deduplicate_segments(candidates, already_sorted_by_start=True)
+    best = heapq.nlargest(max_clips, unique, key=attrgetter("score"))
+    return sorted(best, key=attrgetter("start"))
 
 
 def pick_even_segments(video_duration: float, clip_duration: int, max_clips: int) -> List[ClipSegment]:
@@ -321,79 +484,237 @@ def pick_even_segments(video_duration: float, clip_duration: int, max_clips: int
     return segments
 
 
-def render_vertical_clip(source_video: Path, target_video: Path, start: float, end: float) -> None:
+# ffmpeg only writes errors to stderr: no banner, no per-frame progress lines. The pipe
+# then carries a few lines per clip instead of a continuous stats stream, and failures
+# still surface through run_command's stderr tail.
+_FFMPEG_QUIET = ["ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error"]
+_GPU_H264_ENCODERS = frozenset({"h264_nvenc", "h264_qsv", "h264_vaapi", "h264_videotoolbox"})
+# Encoders whose forced keyframes come out as IDR frames (libx264 by default, NVENC via
+# -forced-idr), which the stream-copy segment split in the single-pass render relies on.
+_IDR_KEYFRAME_ENCODERS = frozenset({"libx264", "h264_nvenc"})
+# An encoder listed by `ffmpeg -encoders` can still lack hardware (e.g. NVENC in a static
+# build on a machine without an NVIDIA GPU), so the first one that actually works is
+# remembered and tried first for every later clip.
+_working_encoder: str | None = None
+
+
+@functools.lru_cache(maxsize=1)
+def _available_encoders() -> frozenset:
+    try:
+        output = run_command(["ffmpeg", "-hide_banner", "-encoders"])
+    except (OSError, RuntimeError):
+        return frozenset()
+    names = set()
+    in_listing = False
+    for line in output.splitlines():
+        parts = line.split()
+        if not in_listing:
+            # The encoder table starts after the " ------" separator below the legend.
+            in_listing = bool(parts) and set(parts[0]) == {"-"}
+            continue
+        if len(parts) >= 2:
+            names.add(parts[1])
+    return frozenset(names)
+
+
+@functools.lru_cache(maxsize=32)
+def _audio_codec(video_path_str: str, mtime: float) -> str:
+    try:
+        output = run_command(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "a:0",
+                "-show_entries",
+                "stream=codec_name",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                video_path_str,
+            ]
+        )
+    except RuntimeError:
+        return ""
+    return output.strip().lower()
+
+
+def _vertical_vf(width: int, height: int, fps: int) -> str:
+    # Drop frames to the target rate first, then crop the centered 9:16 window in source
+    # space and scale that once: the scaler works on fewer pixels and frames, and no
+    # oversized cover-scaled frame is allocated.
+    return (
+        f"fps={fps},crop='min(iw,ih*{width}/{height})':'min(ih,iw*{height}/{width})',"
+        f"scale={width}:{height}"
+    )
+
+
+def _encode_profiles() -> List[dict]:
+    gpu_vf = _vertical_vf(1080, 1920, 30)
     profiles = [
         {
             "codec": "h264_amf",
-            "vf": "scale=720:1280:force_original_aspect_ratio=increase,crop=720:1280,fps=24",
+            "vf": _vertical_vf(720, 1280, 24),
             "preset": "speed",
+            "pix_fmt": "yuv420p",
             "audio_bitrate": "96k",
             "threads": "1",
             "extra": [],
         },
+        {
+            "codec": "h264_nvenc",
+            "vf": gpu_vf,
+            "preset": "p4",
+            "pix_fmt": "yuv420p",
+            "audio_bitrate": "128k",
+            "threads": "1",
+            # Without forced-idr NVENC turns forced keyframes into plain I-frames that the
+            # segment muxer can't cut on.
+            "extra": ["-rc", "vbr", "-cq", "23", "-forced-idr", "1"],
+        },
+        {
+            "codec": "h264_qsv",
+            "vf": gpu_vf,
+            "preset": "veryfast",
+            "pix_fmt": "nv12",
+            "audio_bitrate": "128k",
+            "threads": "1",
+            "extra": ["-global_quality", "23"],
+        },
+        {
+            "codec": "h264_vaapi",
+            # VAAPI encodes from GPU surfaces, so the CPU-filtered frames are uploaded last.
+            "vf": f"{gpu_vf},format=nv12,hwupload",
+            "input_args": ["-vaapi_device", "/dev/dri/renderD128"],
+            "audio_bitrate": "128k",
+            "threads": "1",
+            "extra": ["-qp", "23"],
+        },
+        {
+            "codec": "h264_videotoolbox",
+            "vf": gpu_vf,
+            "pix_fmt": "yuv420p",
+            "audio_bitrate": "128k",
+            "threads": "1",
+            "extra": ["-b:v", "6M"],
+        },
         {
             "codec": "libx264",
-            "vf": "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,fps=30",
+            "vf": _vertical_vf(1080, 1920, 30),
             "preset": "veryfast",
             "crf": "23",
+            "pix_fmt": "yuv420p",
             "audio_bitrate": "128k",
             "threads": "2",
             "extra": [],
         },
         {
             "codec": "libx264",
-            "vf": "scale=720:1280:force_original_aspect_ratio=increase,crop=720:1280,fps=24",
+            "vf": _vertical_vf(720, 1280, 24),
             "preset": "ultrafast",
             "crf": "28",
+            "pix_fmt": "yuv420p",
             "audio_bitrate": "96k",
             "threads": "1",
             "extra": ["-tune", "zerolatency", "-x264-params", "ref=1:rc-lookahead=0:subme=0:me=dia"],
         },
         {
             "codec": "libx264",
-            "vf": "scale=540:960:force_original_aspect_ratio=increase,crop=540:960,fps=20",
+            "vf": _vertical_vf(540, 960, 20),
             "preset": "ultrafast",
             "crf": "32",
+            "pix_fmt": "yuv420p",
             "audio_bitrate": "64k",
             "threads": "1",
             "extra": ["-tune", "zerolatency", "-x264-params", "ref=1:rc-lookahead=0:subme=0:me=dia"],
         },
     ]
+    # Skip profiles whose encoder this ffmpeg build doesn't ship instead of paying an
+    # ffmpeg startup per clip just to fail. If the listing itself failed, or this build
+    # ships none of the encoders, keep the CPU profiles so ffmpeg runs and reports the
+    # real cause instead of the ladder giving up without trying anything.
+    available = _available_encoders()
+    listed = [profile for profile in profiles if profile["codec"] in available]
+    if listed:
+        profiles = listed
+    elif available:
+        profiles = [profile for profile in profiles if profile["codec"] == "libx264"]
+    else:
+        profiles = [profile for profile in profiles if profile["codec"] not in _GPU_H264_ENCODERS]
+    if _working_encoder:
+        profiles.sort(key=lambda profile: profile["codec"] != _working_encoder)
+    return profiles
+
+
+def _remember_working_encoder(codec: str) -> None:
+    global _working_encoder
+    _working_encoder = codec
+
+
+def _seek_input_args(source_video: Path, start: float, end: float) -> List[str]:
+    # Input seeking already jumps to the preceding keyframe and decodes less than one GOP
+    # to reach `start`, so the cut stays exact without probing keyframes first.
+    duration = max(0.0, end - start)
+    return [
+        # Offload decode to whatever hardware decoder is present; ffmpeg falls
+        # back to software decoding on its own when none is usable.
+        "-hwaccel",
+        "auto",
+        "-ss",
+        f"{start:.3f}",
+        "-t",
+        f"{duration:.3f}",
+        "-i",
+        str(source_video),
+    ]
+
+
+def _video_codec_args(profile: dict) -> List[str]:
+    return [
+        "-c:v",
+        profile["codec"],
+        *(["-preset", profile["preset"]] if "preset" in profile else []),
+        *(["-crf", profile["crf"]] if "crf" in profile else []),
+        "-threads",
+        profile["threads"],
+        *(["-pix_fmt", profile["pix_fmt"]] if "pix_fmt" in profile else []),
+    ]
+
+
+def _encode_output_args(profile: dict, source_is_aac: bool, target_video: Path) -> List[str]:
+    return [
+        "-vf",
+        profile["vf"],
+        *_video_codec_args(profile),
+        *(["-c:a", "copy"] if source_is_aac else ["-c:a", "aac", "-b:a", profile["audio_bitrate"]]),
+        *profile["extra"],
+        "-movflags",
+        "+faststart",
+        str(target_video),
+    ]
+
+
+def _source_is_aac(source_video: Path) -> bool:
+    return _audio_codec(str(source_video), source_video.stat().st_mtime) == "aac"
+
+
+def render_vertical_clip(source_video: Path, target_video: Path, start: float, end: float) -> None:
+    input_args = _seek_input_args(source_video, start, end)
+    source_is_aac = _source_is_aac(source_video)
 
     last_error = "Unknown ffmpeg error"
-    for profile in profiles:
+    for profile in _encode_profiles():
         try:
             run_command(
                 [
-                    "ffmpeg",
+                    *_FFMPEG_QUIET,
                     "-y",
-                    "-ss",
-                    f"{start:.3f}",
-                    "-to",
-                    f"{end:.3f}",
-                    "-i",
-                    str(source_video),
-                    "-vf",
-                    profile["vf"],
-                    "-c:v",
-                    profile["codec"],
-                    "-preset",
-                    profile["preset"],
-                    *([] if profile["codec"] == "h264_amf" else ["-crf", profile["crf"]]),
-                    "-threads",
-                    profile["threads"],
-                    "-pix_fmt",
-                    "yuv420p",
-                    "-c:a",
-                    "aac",
-                    "-b:a",
-                    profile["audio_bitrate"],
-                    *profile["extra"],
-                    "-movflags",
-                    "+faststart",
-                    str(target_video),
+                    *profile.get("input_args", []),
+                    *input_args,
+                    *_encode_output_args(profile, source_is_aac, target_video),
                 ]
             )
+            _remember_working_encoder(profile["codec"])
             return
         except RuntimeError as exc:
             last_error = str(exc)
@@ -402,6 +723,147 @@ def render_vertical_clip(source_video: Path, target_video: Path, start: float, e
     raise RuntimeError(f"Gagal render clip setelah fallback profil encode: {last_error}")
 
 
+def _render_vertical_clips_single_pass(
+    source_video: Path, jobs: List[Tuple[Path, Path, float, float]]
+) -> None:
+    # Every segment uses the same filter/encoder settings, so open the source once per
+    # segment with an exact input seek, join the segments with the concat filter and encode
+    # once (one encoder init and rate-control ramp-up instead of one per clip), forcing
+    # keyframes at the joins. A stream-copy segment pass then splits the result back into
+    # clips exactly at those keyframes.
+    has_audio = bool(_audio_codec(str(source_video), source_video.stat().st_mtime))
+    input_args: List[str] = []
+    concat_inputs = ""
+    boundaries: List[float] = []
+    elapsed = 0.0
+    for index, (_, _, start, end) in enumerate(jobs):
+        input_args.extend(_seek_input_args(source_video, start, end))
+        concat_inputs += f"[{index}:v:0]" + (f"[{index}:a:0]" if has_audio else "")
+        elapsed += max(0.0, end - start)
+        boundaries.append(elapsed)
+    split_times = ",".join(f"{boundary:.3f}" for boundary in boundaries[:-1])
+
+    work_dir = Path(tempfile.mkdtemp(prefix="concat_", dir=jobs[0][1].parent))
+    try:
+        joined_video = work_dir / "joined.mp4"
+
+        encoded = False
+        last_error = "No encoder that emits IDR frames on request is available"
+        for profile in _encode_profiles():
+            # Stop at the first profile the split can't cut (AMF, QSV, VAAPI, ...) so the
+            # per-clip fallback renders with it instead of this pass quietly settling for
+            # a lower-priority libx264 profile.
+            if profile["codec"] not in _IDR_KEYFRAME_ENCODERS:
+                break
+            try:
+                concat_filter = f"{concat_inputs}concat=n={len(jobs)}:v=1:a={int(has_audio)}"
+                run_command(
+                    [
+                        *_FFMPEG_QUIET,
+                        "-y",
+                        *profile.get("input_args", []),
+                        *input_args,
+                        "-filter_complex",
+                        # The concat filter re-timestamps its output, so the joins land
+                        # exactly at the cumulative clip durations.
+                        f"{concat_filter}[joined_v]{'[joined_a]' if has_audio else ''};"
+                        f"[joined_v]{profile['vf']}[v]",
+                        "-map",
+                        "[v]",
+                        *(["-map", "[joined_a]"] if has_audio else []),
+                        *_video_codec_args(profile),
+                        # Audio is decoded for the concat filter, so it can't be copied.
+                        *(["-c:a", "aac", "-b:a", profile["audio_bitrate"]] if has_audio else []),
+                        *profile["extra"],
+                        "-force_key_frames",
+                        split_times,
+                        # joined.mp4 is split and deleted right away, so no faststart.
+                        str(joined_video),
+                    ]
+                )
+                # Not remembered as the working encoder: this pass only ever tries the
+                # IDR-capable subset, so it says nothing about the full ladder's best pick.
+                encoded = True
+                break
+            except RuntimeError as exc:
+                last_error = str(exc)
+                continue
+        if not encoded:
+            raise RuntimeError(last_error)
+
+        run_command(
+            [
+                *_FFMPEG_QUIET,
+                "-y",
+                "-i",
+                str(joined_video),
+                "-map",
+                "0",
+                "-c",
+                "copy",
+                "-f",
+                "segment",
+                "-segment_times",
+                split_times,
+                "-reset_timestamps",
+                "1",
+                "-segment_format_options",
+                "movflags=+faststart",
+                str(work_dir / "part_%03d.mp4"),
+            ]
+        )
+        parts = [work_dir / f"part_{index:03d}.mp4" for index in range(len(jobs))]
+        if not all(part.exists() for part in parts):
+            raise RuntimeError("Segment split produced fewer clips than requested")
+        for part, (_, target_video, _, _) in zip(parts, jobs):
+            os.replace(part, target_video)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _render_worker_count() -> int:
+    # Mirrors a --threadcount style knob; default keeps half the cores free
+    # because every ffmpeg child already runs its own encoder threads.
+    raw = os.getenv("CLIPPER_THREADCOUNT", "").strip()
+    if raw.isdigit() and int(raw) > 0:
+        return int(raw)
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _render_one(job: Tuple[Path, Path, float, float]) -> Path:
+    source_video, target_video, start, end = job
+    render_vertical_clip(source_video, target_video, start, end)
+    return target_video
+
+
+def render_vertical_clips(jobs: List[Tuple[Path, Path, float, float]]) -> List[Path]:
+    sources = {job[0] for job in jobs}
+    if len(jobs) > 1 and len(sources) == 1:
+        try:
+            _render_vertical_clips_single_pass(sources.pop(), jobs)
+            return [job[1] for job in jobs]
+        except RuntimeError:
+            # Fall back to one ffmpeg per segment, each walking the full profile ladder.
+            pass
+
+    workers = min(len(jobs), _render_worker_count())
+    if workers <= 1:
+        return [_render_one(job) for job in jobs]
+    # ffmpeg does the heavy lifting in its own process, so threads are enough to overlap renders.
+    produced: List[Path | None] = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_render_one, job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            try:
+                produced[futures[future]] = future.result()
+            except Exception:
+                # Don't start queued renders for a video that is already failing.
+                for pending in futures:
+                    pending.cancel()
+                raise
+    return [path for path in produced if path is not None]
+
+
 def build_clips_for_video(
     video_id: str,
     video_url: str,
@@ -409,18 +871,30 @@ def build_clips_for_video(
     output_dir: Path,
     clip_duration: int = 30,
     max_clips: int = 3,
+    source_video: Path | None = None,
 ) -> List[Path]:
-    source_video = download_video(video_url, download_dir)
-    video_duration = ffprobe_duration(source_video)
-
-    subtitle_rows: List[Tuple[float, float, str]] = []
+    # Both downloads are independent yt-dlp runs, so the subtitle fetch rides in the
+    # shadow of the (much longer) video download. A source_video already fetched by
+    # download_videos_batch skips the video download entirely. The executor is shut
+    # down without waiting so a failed video download surfaces immediately instead
+    # of blocking on a subtitle run whose result would be thrown away.
+    executor = ThreadPoolExecutor(max_workers=2)
     try:
-        download_subtitles(video_url, download_dir)
-        subtitle_file = find_subtitle_file(video_id, download_dir)
-        if subtitle_file:
-            subtitle_rows = parse_vtt(subtitle_file)
-    except Exception:
-        subtitle_rows = []
+        subtitle_future = executor.submit(download_subtitles, video_url, download_dir)
+        if source_video is None or not source_video.exists():
+            source_video = executor.submit(download_video, video_url, download_dir).result()
+        video_duration = ffprobe_duration(source_video)
+
+        subtitle_rows: List[Tuple[float, float, str]] = []
+        try:
+            subtitle_future.result()
+            subtitle_file = find_subtitle_file(video_id, download_dir)
+            if subtitle_file:
+                subtitle_rows = parse_vtt(subtitle_file)
+        except Exception:
+            subtitle_rows = []
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
     picked = pick_segments_from_subtitles(
         subtitle_rows=subtitle_rows,
@@ -431,13 +905,12 @@ def build_clips_for_video(
     if not picked:
         picked = pick_even_segments(video_duration, clip_duration, max_clips)
 
-    produced: List[Path] = []
     safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", video_id)
-    for idx, segment in enumerate(picked, start=1):
-        out_path = output_dir / f"{safe_id}_clip_{idx:02d}.mp4"
-        render_vertical_clip(source_video, out_path, segment.start, segment.end)
-        produced.append(out_path)
-    return produced
+    jobs = [
+        (source_video, output_dir / f"{safe_id}_clip_{idx:02d}.mp4", segment.start, segment.end)
+        for idx, segment in enumerate(picked, start=1)
+    ]
+    return render_vertical_clips(jobs)
 
 
 def build_clips_for_local_file(
@@ -450,10 +923,9 @@ def build_clips_for_local_file(
     video_duration = ffprobe_duration(source_video)
     picked = pick_even_segments(video_duration, clip_duration, max_clips)
 
-    produced: List[Path] = []
     safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", source_id)
-    for idx, segment in enumerate(picked, start=1):
-        out_path = output_dir / f"{safe_id}_upload_clip_{idx:02d}.mp4"
-        render_vertical_clip(source_video, out_path, segment.start, segment.end)
-        produced.append(out_path)
-    return produced
+    jobs = [
+        (source_video, output_dir / f"{safe_id}_upload_clip_{idx:02d}.mp4", segment.start, segment.end)
+        for idx, segment in enumerate(picked, start=1)
+    ]
+    return render_vertical_clips(jobs)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import functools
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -8,18 +10,27 @@ from dotenv import load_dotenv
 ROOT_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(ROOT_DIR / ".env")
 
-def _secret_or_env(key: str, default: str = "") -> str:
-    value = os.getenv(key, "").strip()
-    if value:
-        return value
+@functools.lru_cache(maxsize=1)
+def _streamlit_secrets() -> dict:
+    # Only consult st.secrets when Streamlit is already loaded (i.e. running the UI);
+    # importing it just to look for secrets costs hundreds of ms for non-UI callers.
+    if "streamlit" not in sys.modules:
+        return {}
     try:
         import streamlit as st
 
-        secret_value = str(st.secrets.get(key, "")).strip()
-        if secret_value:
-            return secret_value
+        return dict(st.secrets)
     except Exception:
-        pass
+        return {}
+
+
+def _secret_or_env(key: str, default: str = "") -> str:
+    value = os.getenv(key, "").strip()
+    if value:
+        return value
+    secret_value = str(_streamlit_secrets().get(key, "")).strip()
+    if secret_value:
+        return secret_value
     return default
 
 
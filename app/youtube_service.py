@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import functools
 import re
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import Dict, List, Tuple
 
 from googleapiclient.discovery import build
+from googleapiclient.http import build_http
 
 
 @dataclass
@@ -34,6 +36,29 @@ def parse_iso8601_duration(value: str) -> int:
     return h * 3600 + m * 60 + s
 
 
+@functools.lru_cache(maxsize=4)
+def _youtube_client(api_key: str):
+    # Building the client parses the discovery document; do it once per key and use the
+    # copy bundled with google-api-python-client instead of fetching it. The client is
+    # shared by every Streamlit session thread and httplib2 connections aren't
+    # thread-safe, so every execute() is handed its own connection from build_http().
+    return build("youtube", "v3", developerKey=api_key, cache_discovery=False, static_discovery=True)
+
+
+def _execute_batch(youtube, requests: list) -> List[Tuple[dict | None, Exception | None]]:
+    # Send several API calls in one HTTP round trip; results keep the order of `requests`.
+    results: Dict[str, Tuple[dict | None, Exception | None]] = {}
+
+    def _collect(request_id: str, response: dict | None, exception: Exception | None) -> None:
+        results[request_id] = (response, exception)
+
+    batch = youtube.new_batch_http_request(callback=_collect)
+    for index, request in enumerate(requests):
+        batch.add(request, request_id=str(index))
+    batch.execute(http=build_http())
+    return [results.get(str(index), (None, None)) for index in range(len(requests))]
+
+
 def fetch_trending_videos(
     api_key: str,
     region_code: str = "ID",
@@ -42,9 +67,9 @@ def fetch_trending_videos(
     min_duration_seconds: int = 60,
     max_duration_seconds: int = 2400,
 ) -> List[TrendingVideo]:
-    youtube = build("youtube", "v3", developerKey=api_key)
+    youtube = _youtube_client(api_key)
 
-    def _query(category: str | None) -> dict:
+    def _query(category: str | None):
         params = {
             "part": "snippet,statistics,contentDetails",
             "chart": "mostPopular",
@@ -53,12 +78,21 @@ def fetch_trending_videos(
         }
         if category:
             params["videoCategoryId"] = category
-        return youtube.videos().list(**params).execute()
-
-    response = _query(category_id.strip() or None)
-    # Fallback: beberapa region/category bisa kosong.
-    if not response.get("items"):
-        response = _query(None)
+        return youtube.videos().list(**params)
+
+    category = category_id.strip() or None
+    if category:
+        # Fallback: beberapa region/category bisa kosong. The category-less query rides
+        # in the same batch so falling back costs no extra round trip.
+        (response, error), (fallback, fallback_error) = _execute_batch(
+            youtube, [_query(category), _query(None)]
+        )
+        if not (response or {}).get("items"):
+            if fallback is None:
+                raise error or fallback_error or RuntimeError("YouTube API returned no response")
+            response = fallback
+    else:
+        response = _query(None).execute(http=build_http())
 
     filtered_results: List[TrendingVideo] = []
     unfiltered_results: List[TrendingVideo] = []
@@ -110,7 +144,7 @@ def fetch_top_viewed_recent_videos(
     category_id: str = "24",
 ) -> List[TrendingVideo]:
     days_back = max(1, min(7, days_back))
-    youtube = build("youtube", "v3", developerKey=api_key)
+    youtube = _youtube_client(api_key)
 
     candidate_limit = max(25, min(50, max_results * 4))
 
@@ -126,7 +160,7 @@ def fetch_top_viewed_recent_videos(
             params["publishedAfter"] = published_after
         if category_id.strip():
             params["videoCategoryId"] = category_id.strip()
-        response = youtube.search().list(**params).execute()
+        response = youtube.search().list(**params).execute(http=build_http())
         return [
             item.get("id", {}).get("videoId", "")
             for item in response.get("items", [])
@@ -163,7 +197,7 @@ def fetch_top_viewed_recent_videos(
             id=",".join(ids[:50]),
             maxResults=50,
         )
-        .execute()
+        .execute(http=build_http())
     )
 
     filtered_results: List[TrendingVideo] = []